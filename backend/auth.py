@@ -5,43 +5,96 @@ from datetime import datetime, timedelta
 from fastapi import HTTPException
 import os
 import json
-from typing import Dict, Any
+import time
+import hashlib
+import threading
+import functools
+from typing import Dict, Any, Optional
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Firebase Admin SDK initialization
-def initialize_firebase():
-    """Initialize Firebase Admin SDK"""
-    if not firebase_admin._apps:
-        # Use individual Firebase environment variables
-        private_key = os.getenv('FIREBASE_PRIVATE_KEY')
-        project_id = os.getenv('FIREBASE_PROJECT_ID')
-        client_email = os.getenv('FIREBASE_CLIENT_EMAIL')
-        
-        if private_key and project_id and client_email:
-            firebase_config = {
-                "type": "service_account",
-                "project_id": project_id,
-                "private_key": private_key.replace('\\n', '\n'),
-                "client_email": client_email,
-                "token_uri": "https://oauth2.googleapis.com/token",
-            }
-            cred = credentials.Certificate(firebase_config)
-            firebase_admin.initialize_app(cred)
-        else:
-            raise Exception("Firebase credentials not found. Please set FIREBASE_PROJECT_ID, FIREBASE_PRIVATE_KEY, and FIREBASE_CLIENT_EMAIL environment variables.")
+# JWT settings are resolved once at import instead of on every request
+_JWT_SECRET = os.getenv('JWT_SECRET_KEY')
+_JWT_ALGO = os.getenv('JWT_ALGORITHM', 'HS256')
+_JWT_EXP_HOURS = int(os.getenv('JWT_EXPIRATION_HOURS', 24))
+
+if not _JWT_SECRET:
+    raise Exception("JWT secret key not configured. Please set the JWT_SECRET_KEY environment variable.")
 
-# Initialize Firebase on module import
-initialize_firebase()
+# Verified-token caches keyed by SHA-256 of the raw token, so repeat requests
+# skip signature verification (and the Firebase round-trip). Hits are still
+# checked against the payload's `exp`, so an entry never outlives its token.
+_jwt_cache = TTLCache(maxsize=10000, ttl=int(os.getenv('JWT_CACHE_TTL', 300)))
+_jwt_cache_lock = threading.Lock()
+_firebase_cache = TTLCache(maxsize=10000, ttl=int(os.getenv('FIREBASE_CACHE_TTL', 30)))
+_firebase_cache_lock = threading.Lock()
+
+def _token_key(token: str) -> bytes:
+    """Cache key for a raw token"""
+    return hashlib.sha256(token.encode()).digest()
+
+def _get_cached_payload(cache: TTLCache, lock: threading.Lock, key: bytes) -> Optional[Dict[str, Any]]:
+    """Return a cached payload if present and not past its `exp` claim"""
+    with lock:
+        payload = cache.get(key)
+    if payload is not None and payload.get('exp', 0) > time.time():
+        return payload
+    return None
+
+# Firebase Admin SDK initialization
+@functools.lru_cache(maxsize=1)
+def _get_firebase_app() -> firebase_admin.App:
+    """
+    Initialize Firebase Admin SDK on first use and return the app
+    
+    Deferred from import so worker cold start does not pay for parsing the
+    service account key. With gunicorn --preload, call this in the master so
+    forked workers inherit the initialized app.
+    """
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
+    
+    # Use individual Firebase environment variables
+    private_key = os.getenv('FIREBASE_PRIVATE_KEY')
+    project_id = os.getenv('FIREBASE_PROJECT_ID')
+    client_email = os.getenv('FIREBASE_CLIENT_EMAIL')
+    
+    if private_key and project_id and client_email:
+        firebase_config = {
+            "type": "service_account",
+            "project_id": project_id,
+            "private_key": private_key.replace('\\n', '\n'),
+            "client_email": client_email,
+            "token_uri": "https://oauth2.googleapis.com/token",
+        }
+        cred = credentials.Certificate(firebase_config)
+        return firebase_admin.initialize_app(cred)
+    else:
+        raise Exception("Firebase credentials not found. Please set FIREBASE_PROJECT_ID, FIREBASE_PRIVATE_KEY, and FIREBASE_CLIENT_EMAIL environment variables.")
 
 def verify_firebase_token(firebase_token: str) -> Dict[str, Any]:
     """
     Verify Firebase ID token and return decoded claims
     """
+    key = _token_key(firebase_token)
+    cached = _get_cached_payload(_firebase_cache, _firebase_cache_lock, key)
+    if cached is not None:
+        return cached
+    
+    # Resolved outside the try so a server misconfiguration is not reported
+    # to the client as an invalid token
+    try:
+        firebase_app = _get_firebase_app()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Firebase not configured: {str(e)}")
+    
     try:
-        decoded_token = auth.verify_id_token(firebase_token)
+        decoded_token = auth.verify_id_token(firebase_token, app=firebase_app)
+        with _firebase_cache_lock:
+            _firebase_cache[key] = decoded_token
         return decoded_token
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid Firebase token: {str(e)}")
@@ -53,31 +106,35 @@ def create_jwt_token(user_id: str, email: str) -> str:
     payload = {
         "user_id": user_id,
         "email": email,
-        "exp": datetime.utcnow() + timedelta(hours=int(os.getenv('JWT_EXPIRATION_HOURS', 24))),
+        "exp": datetime.utcnow() + timedelta(hours=_JWT_EXP_HOURS),
         "iat": datetime.utcnow()
     }
     
-    secret_key = os.getenv('JWT_SECRET_KEY')
-    algorithm = os.getenv('JWT_ALGORITHM', 'HS256')
-    
-    if not secret_key:
-        raise HTTPException(status_code=500, detail="JWT secret key not configured")
-    
-    token = jwt.encode(payload, secret_key, algorithm=algorithm)
+    token = jwt.encode(payload, _JWT_SECRET, algorithm=_JWT_ALGO)
     return token
 
 def verify_jwt_token(token: str) -> Dict[str, Any]:
     """
     Verify JWT token and return payload
     """
+    # Reject anything that is not shaped like a JWT before hashing or HMAC
+    if not isinstance(token, str) or token.count(".") != 2:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    key = _token_key(token)
+    cached = _get_cached_payload(_jwt_cache, _jwt_cache_lock, key)
+    if cached is not None:
+        return cached
+    
     try:
-        secret_key = os.getenv('JWT_SECRET_KEY')
-        algorithm = os.getenv('JWT_ALGORITHM', 'HS256')
-        
-        if not secret_key:
-            raise HTTPException(status_code=500, detail="JWT secret key not configured")
+        # Cheap header check: refuse unexpected algorithms before verifying
+        if jwt.get_unverified_header(token).get("alg") != _JWT_ALGO:
+            raise HTTPException(status_code=401, detail="Invalid token")
         
-        payload = jwt.decode(token, secret_key, algorithms=[algorithm])
+        payload = jwt.decode(token, _JWT_SECRET, algorithms=[_JWT_ALGO])
+        # Only successfully verified tokens are cached
+        with _jwt_cache_lock:
+            _jwt_cache[key] = payload
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
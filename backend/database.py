@@ -1,22 +1,80 @@
 from supabase import create_client, Client
 import os
+import logging
+import httpx
+import orjson
+from functools import lru_cache
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from fastapi import HTTPException
+from postgrest.exceptions import APIError
+
+logger = logging.getLogger(__name__)
+
+# Connection pool limits for the PostgREST HTTP session
+DB_POOL_LIMITS = httpx.Limits(max_connections=60, max_keepalive_connections=40, keepalive_expiry=60)
+DB_TRANSPORT_RETRIES = 3
+
+class _OrjsonClient(httpx.Client):
+    """httpx client that serializes JSON request bodies with orjson instead of the stdlib"""
+    
+    def build_request(self, method, url, *, json=None, headers=None, **kwargs):
+        if json is not None:
+            kwargs['content'] = orjson.dumps(json)
+            headers = {**(headers or {}), 'Content-Type': 'application/json'}
+        return super().build_request(method, url, headers=headers, **kwargs)
+
+def _configure_connection_pool(client: Client) -> None:
+    """Replace the PostgREST session with one backed by a sized, keep-alive connection pool"""
+    session = client.postgrest.session
+    client.postgrest.session = _OrjsonClient(
+        base_url=session.base_url,
+        headers=session.headers,
+        timeout=session.timeout,
+        transport=httpx.HTTPTransport(limits=DB_POOL_LIMITS, retries=DB_TRANSPORT_RETRIES)
+    )
+    session.close()
 
 # Initialize Supabase client
+@lru_cache()
 def get_supabase_client() -> Client:
-    """Get Supabase client instance"""
+    """Get Supabase client instance (created once per process)"""
     url = os.getenv('SUPABASE_URL')
     key = os.getenv('SUPABASE_KEY')
     
     if not url or not key:
         raise HTTPException(status_code=500, detail="Supabase configuration missing")
     
-    return create_client(url, key)
+    client = create_client(url, key)
+    _configure_connection_pool(client)
+    return client
 
 supabase_client = get_supabase_client()
 
+def execute_with_reconnect(build_query: Callable[[], Any], retry: bool = False) -> Any:
+    """
+    Execute a query, optionally retrying once if a pooled connection was dropped
+    
+    httpx discards the broken connection, so the retry runs on the same
+    shared session with a fresh connection; the session is never swapped
+    out from under other threads using it. The drop can happen after the
+    request was sent, so only idempotent queries may pass retry=True.
+    
+    Args:
+        build_query: Callable returning the query builder to execute
+        retry: Whether the query is safe to run twice
+    
+    Returns:
+        The query result
+    """
+    try:
+        return build_query().execute()
+    except httpx.RemoteProtocolError as e:
+        if not retry:
+            raise
+        logger.warning("Database connection dropped, retrying: %s", e)
+        return build_query().execute()
+
 def save_document_metadata(
     doc_id: str,
     user_id: str,
@@ -29,30 +87,25 @@ def save_document_metadata(
     Save document metadata to Supabase
     """
     try:
-        # Set user context for RLS before inserting document
-        try:
-            supabase_client.rpc('set_user_context', {'p_user_id': user_id}).execute()
-        except:
-            pass  # Continue even if RLS context setting fails
-        
+        # Set user context for RLS and insert the document in a single call
         document_data = {
-            'doc_id': doc_id,
-            'user_id': user_id,
-            'filename': filename,
-            'file_type': file_type,
-            'file_size': file_size,
-            'gcp_path': gcp_path,
-            'embedding_status': 'pending',
-            'uploaded_at': datetime.now().isoformat()
+            'p_user_id': user_id,
+            'p_doc_id': doc_id,
+            'p_filename': filename,
+            'p_file_type': file_type,
+            'p_file_size': file_size,
+            'p_gcp_path': gcp_path,
+            'p_uploaded_at': datetime.now().isoformat()
         }
         
-        result = supabase_client.table('documents').insert(document_data).execute()
+        # Not retried: a dropped connection may follow a committed insert
+        result = execute_with_reconnect(lambda: supabase_client.rpc('insert_document_with_context', document_data))
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to save document metadata")
             
     except Exception as e:
-        print(f"Error saving document metadata: {e}")
+        logger.error("Error saving document metadata: %s", e)
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 def get_user_documents(user_id: str) -> List[Dict[str, Any]]:
@@ -60,19 +113,16 @@ def get_user_documents(user_id: str) -> List[Dict[str, Any]]:
     Get all documents for a specific user
     """
     try:
-        # Set user context for RLS
-        supabase_client.rpc('set_user_context', {'p_user_id': user_id}).execute()
-        
-        result = supabase_client.table('documents') \
-            .select('*') \
-            .eq('user_id', user_id) \
-            .order('uploaded_at', desc=True) \
-            .execute()
+        # Set user context for RLS and fetch documents in a single call
+        result = execute_with_reconnect(
+            lambda: supabase_client.rpc('get_user_documents_with_context', {'p_user_id': user_id}),
+            retry=True
+        )
         
         return result.data if result.data else []
         
     except Exception as e:
-        print(f"Error fetching user documents: {e}")
+        logger.error("Error fetching user documents: %s", e)
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 def update_embedding_status(doc_id: str, status: str, processed_at: Optional[str] = None) -> None:
@@ -87,16 +137,15 @@ def update_embedding_status(doc_id: str, status: str, processed_at: Optional[str
         elif status == 'completed':
             update_data['processed_at'] = datetime.now().isoformat()
         
-        result = supabase_client.table('documents') \
-            .update(update_data) \
-            .eq('doc_id', doc_id) \
-            .execute()
+        result = execute_with_reconnect(lambda: supabase_client.table('documents')
+            .update(update_data)
+            .eq('doc_id', doc_id), retry=True)
         
         if not result.data:
-            print(f"Warning: No document found with doc_id {doc_id}")
+            logger.warning("No document found with doc_id %s", doc_id)
             
     except Exception as e:
-        print(f"Error updating embedding status: {e}")
+        logger.error("Error updating embedding status: %s", e)
 
 def save_or_update_user(user_id: str, email: str) -> None:
     """
@@ -112,38 +161,38 @@ def save_or_update_user(user_id: str, email: str) -> None:
         }
         
         # Use upsert which should work for both insert and update
-        result = supabase_client.table('users').upsert(user_data).execute()
+        result = execute_with_reconnect(lambda: supabase_client.table('users').upsert(user_data), retry=True)
         
         # If upsert failed, try with RLS context
         if not result.data:
             try:
                 # Set user context for RLS and retry
-                supabase_client.rpc('set_user_context', {'p_user_id': user_id}).execute()
-                result = supabase_client.table('users').upsert(user_data).execute()
-            except:
-                pass  # Continue with the original error
+                execute_with_reconnect(lambda: supabase_client.rpc('set_user_context', {'p_user_id': user_id}), retry=True)
+                result = execute_with_reconnect(lambda: supabase_client.table('users').upsert(user_data), retry=True)
+            except (httpx.TimeoutException, APIError) as e:
+                # Fail fast: a timed-out or rejected retry would only add latency
+                logger.warning("Retrying user save with RLS context failed: %s", e)
+                return
         
-        print(f"User saved successfully: {user_id}")
+        logger.debug("User saved successfully: %s", user_id)
             
     except Exception as e:
-        print(f"Error saving user data: {e}")
         # Don't raise an exception for user save errors during auth
         # The auth can still proceed even if user save fails
-        print(f"Continuing authentication despite user save error")
+        logger.error("Error saving user data, continuing authentication: %s", e)
 
 def get_document_by_id(doc_id: str, user_id: str) -> Optional[Dict[str, Any]]:
     """
     Get a specific document by ID (with user validation)
     """
     try:
-        result = supabase_client.table('documents') \
-            .select('*') \
-            .eq('doc_id', doc_id) \
-            .eq('user_id', user_id) \
-            .execute()
+        result = execute_with_reconnect(lambda: supabase_client.table('documents')
+            .select('*')
+            .eq('doc_id', doc_id)
+            .eq('user_id', user_id), retry=True)
         
         return result.data[0] if result.data else None
         
     except Exception as e:
-        print(f"Error fetching document: {e}")
+        logger.error("Error fetching document: %s", e)
         return None
\ No newline at end of file
@@ -1,15 +1,93 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from pinecone import Pinecone
 import os
-from typing import List, Dict, Any
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from file_processor import extract_text_from_file
-from storage import download_from_gcp
+import logging
+import json
+import asyncio
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional
+from fastapi import HTTPException
+from cachetools import TTLCache
+from redis import Redis
+from rq import Queue
+from parsing import DocumentParseError, parse_document, init_parse_worker
+from storage import download_from_gcp, download_from_gcp_async, upload_to_gcp
 from database import update_embedding_status
 import uuid
 
+logger = logging.getLogger(__name__)
+
 # Initialize OpenAI
 openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+async_openai_client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
+# Worker processes for CPU-bound text extraction, so parsing large files
+# neither holds the GIL in the API process nor blocks the event loop. Every
+# uvicorn worker (and RQ horse) gets its own pool, so keep it small.
+# Workers come from a forkserver rather than a fork of this threaded process,
+# which could copy a lock another thread holds (logging, OpenSSL, urllib3)
+# and deadlock; the server preloads only the lightweight parsing module.
+_PARSE_MP_CONTEXT = multiprocessing.get_context("forkserver")
+_PARSE_MP_CONTEXT.set_forkserver_preload(["parsing"])
+PARSE_POOL_WORKERS = int(os.getenv('PARSE_POOL_WORKERS', min(2, os.cpu_count() or 1)))
+_PARSE_POOL: Optional[ProcessPoolExecutor] = None
+_PARSE_POOL_LOCK = threading.Lock()
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    """Get the parse process pool, created on first use"""
+    global _PARSE_POOL
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is None:
+            _PARSE_POOL = ProcessPoolExecutor(
+                max_workers=PARSE_POOL_WORKERS,
+                mp_context=_PARSE_MP_CONTEXT,
+                initializer=init_parse_worker,
+                initargs=(logging.getLogger().getEffectiveLevel(),)
+            )
+        return _PARSE_POOL
+
+def _discard_parse_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken parse pool so the next job gets a fresh one"""
+    global _PARSE_POOL
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is pool:
+            _PARSE_POOL = None
+    pool.shutdown(wait=False)
+
+async def _run_in_parse_pool(func, *args):
+    """
+    Run a CPU-bound call in the parse process pool
+    
+    A worker that dies (e.g. killed for memory) leaves the pool broken; it
+    is replaced so one bad file does not stop all later ingestion.
+    """
+    pool = _get_parse_pool()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        logger.error("Parse pool broke; replacing it")
+        _discard_parse_pool(pool)
+        raise
+    except DocumentParseError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+# Threads for the ingestion pipeline's blocking I/O (GCS, Supabase, Pinecone
+# upserts), kept apart from the default executor that /chat relies on
+INGEST_POOL_THREADS = 8
+_INGEST_POOL = ThreadPoolExecutor(max_workers=INGEST_POOL_THREADS, thread_name_prefix="ingest")
+
+async def _run_ingest_io(func, *args):
+    """Run a blocking ingestion call on the ingestion thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_INGEST_POOL, func, *args)
+
+# Threads used by the Pinecone client for parallel requests
+PINECONE_POOL_THREADS = 30
 
 # Initialize Pinecone
 def initialize_pinecone():
@@ -17,7 +95,7 @@ def initialize_pinecone():
     api_key = os.getenv('PINECONE_API_KEY')
     
     if not api_key:
-        print("Pinecone API key missing")
+        logger.warning("Pinecone API key missing")
         return None
     
     try:
@@ -28,74 +106,228 @@ def initialize_pinecone():
         # List indexes to verify connection
         indexes = pc.list_indexes()
         available_index_names = [idx.name for idx in indexes]
-        print(f"Available Pinecone indexes: {available_index_names}")
+        logger.debug("Available Pinecone indexes: %s", available_index_names)
         
         if index_name not in available_index_names:
-            print(f"Warning: Pinecone index '{index_name}' not found.")
-            print(f"Available indexes: {available_index_names}")
-            print("Please check the index name matches exactly")
+            logger.warning(
+                "Pinecone index '%s' not found. Available indexes: %s. "
+                "Please check the index name matches exactly",
+                index_name, available_index_names
+            )
             return None
         
         # Connect to the index
-        index = pc.Index(index_name)
-        print(f"✅ Successfully connected to Pinecone index: {index_name}")
-        
-        # Test the connection
-        stats = index.describe_index_stats()
-        print(f"Index stats: {stats}")
+        # pool_threads lets upsert(async_req=True) run batches in parallel
+        index = pc.Index(index_name, pool_threads=PINECONE_POOL_THREADS)
+        logger.info("Successfully connected to Pinecone index: %s", index_name)
         
         return index
     except Exception as e:
-        print(f"Error initializing Pinecone: {e}")
+        logger.error("Error initializing Pinecone: %s", e)
         return None
 
 # Initialize Pinecone index
 pinecone_index = initialize_pinecone()
 
-def generate_embedding(text: str) -> List[float]:
+def warm_up_pinecone() -> None:
     """
-    Generate embedding for text using OpenAI
+    Issue a cheap request so DNS, TLS and the connection pool are ready
+    
+    Called at API startup so the first chat query does not pay for
+    connection setup; also verifies the index is reachable.
+    """
+    if not pinecone_index:
+        return
+    
+    try:
+        stats = pinecone_index.describe_index_stats()
+        logger.debug("Index stats: %s", stats)
+    except Exception as e:
+        logger.error("Error warming up Pinecone connection: %s", e)
+
+# Initialize Redis (optional): backs the document processing queue and
+# shared caches when REDIS_URL is set
+def initialize_redis():
+    """Create a Redis client if REDIS_URL is set"""
+    redis_url = os.getenv('REDIS_URL')
+    
+    if not redis_url:
+        return None
+    
+    try:
+        return Redis.from_url(redis_url)
+    except Exception as e:
+        logger.error("Error connecting to Redis: %s", e)
+        return None
+
+redis_client = initialize_redis()
+
+# Initialize the document processing queue
+def initialize_embedding_queue():
+    """
+    Get the Redis-backed "embeddings" queue if Redis is configured
+    
+    Queued jobs run in separate `rq worker embeddings` processes, so large
+    documents never occupy the API workers. Without REDIS_URL, documents
+    are processed in-process as FastAPI background tasks.
+    """
+    if not redis_client:
+        return None
+    
+    return Queue("embeddings", connection=redis_client)
+
+embedding_queue = initialize_embedding_queue()
+
+# Maximum time a queued document processing job may run, in seconds
+EMBEDDING_JOB_TIMEOUT = 600
+
+# Vector IDs are "{doc_id}_chunk_{i}". This schema is a contract:
+# delete_document_embeddings finds a document's vectors by listing this prefix,
+# so vectors stored under any other ID would never be deleted.
+def vector_id_prefix(doc_id: str) -> str:
+    """ID prefix shared by all vectors of a document"""
+    return f"{doc_id}_chunk_"
+
+def vector_id(doc_id: str, chunk_id: int) -> str:
+    """Pinecone vector ID for a document chunk"""
+    return f"{vector_id_prefix(doc_id)}{chunk_id}"
+
+def chunk_texts_path(user_id: str, doc_id: str) -> str:
+    """GCS path of the JSONL file holding a document's chunk texts"""
+    return f"{user_id}/{doc_id}/chunks.jsonl"
+
+# Parsed chunk texts per (user_id, doc_id), so repeated /chat hits on the same
+# documents do not re-download and re-parse their whole chunks.jsonl
+CHUNK_TEXT_CACHE_SIZE = int(os.getenv('CHUNK_TEXT_CACHE_SIZE', 256))
+CHUNK_TEXT_CACHE_TTL = int(os.getenv('CHUNK_TEXT_CACHE_TTL', 300))
+_chunk_text_cache = TTLCache(maxsize=CHUNK_TEXT_CACHE_SIZE, ttl=CHUNK_TEXT_CACHE_TTL)
+_chunk_text_cache_lock = threading.Lock()
+
+def _forget_chunk_texts(user_id: str, doc_id: str) -> None:
+    """Drop a document's cached chunk texts"""
+    with _chunk_text_cache_lock:
+        _chunk_text_cache.pop((user_id, doc_id), None)
+
+def store_chunk_texts(chunks: List[str], user_id: str, doc_id: str) -> None:
+    """
+    Store chunk texts in GCS, one {"chunk_id", "text"} JSON object per line
+    
+    Chunk text is kept out of Pinecone metadata so vectors stay small; it is
+    fetched from here only for the chunks a search actually returns.
+    """
+    lines = [json.dumps({"chunk_id": i, "text": chunk}) for i, chunk in enumerate(chunks)]
+    upload_to_gcp("\n".join(lines).encode("utf-8"), chunk_texts_path(user_id, doc_id))
+    _forget_chunk_texts(user_id, doc_id)
+
+def load_chunk_texts(user_id: str, doc_id: str) -> Dict[int, str]:
+    """
+    Load a document's chunk texts from GCS
+    
+    Results are cached for CHUNK_TEXT_CACHE_TTL seconds; callers must not
+    mutate the returned mapping.
+    
+    Returns:
+        Mapping of chunk_id to chunk text
+    """
+    key = (user_id, doc_id)
+    with _chunk_text_cache_lock:
+        texts = _chunk_text_cache.get(key)
+    if texts is not None:
+        return texts
+    
+    content = download_from_gcp(chunk_texts_path(user_id, doc_id)).decode("utf-8")
+    texts = {}
+    for line in content.splitlines():
+        if line:
+            record = json.loads(line)
+            texts[record["chunk_id"]] = record["text"]
+    with _chunk_text_cache_lock:
+        _chunk_text_cache[key] = texts
+    return texts
+
+# Embedding size requested from text-embedding-3-small (native size is 1536).
+# Must match the Pinecone index dimension; changing it requires a new index.
+EMBED_DIMS = int(os.getenv('EMBED_DIMS', 512))
+
+# Number of texts sent per OpenAI embeddings request
+EMBEDDING_BATCH_SIZE = 96
+
+# Maximum number of embedding requests in flight per document
+EMBEDDING_CONCURRENCY = 8
+
+def _to_vectors(response) -> List[np.ndarray]:
+    """Convert an OpenAI embeddings response into compact float32 arrays"""
+    return [np.asarray(item.embedding, dtype=np.float32) for item in response.data]
+
+def generate_embeddings_batch(texts: List[str]) -> List[np.ndarray]:
+    """
+    Generate embeddings for several texts in a single OpenAI request
     
     Args:
-        text: Text to embed
+        texts: Texts to embed
     
     Returns:
-        Embedding vector as list of floats
+        float32 embedding vectors in the same order as the input texts
     """
     try:
         response = openai_client.embeddings.create(
-            model="text-embedding-3-small",  # This produces 1536 dimensions
-            input=text
+            model="text-embedding-3-small",
+            input=texts,
+            dimensions=EMBED_DIMS
         )
-        embedding = response.data[0].embedding
-        return embedding
+        # OpenAI returns embeddings in input order
+        return _to_vectors(response)
     except Exception as e:
-        print(f"Error generating embedding: {e}")
+        logger.error("Error generating embeddings: %s", e)
         raise
 
-def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
+def generate_embedding(text: str) -> List[float]:
     """
-    Split text into chunks for embedding
+    Generate embedding for text using OpenAI
     
     Args:
-        text: Text to split
-        chunk_size: Maximum size of each chunk
-        chunk_overlap: Overlap between chunks
+        text: Text to embed
     
     Returns:
-        List of text chunks
+        Embedding vector as list of floats
     """
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-        separators=["\n\n", "\n", " ", ""]
+    return generate_embeddings_batch([text])[0].tolist()
+
+async def generate_embeddings_batch_async(texts: List[str]) -> List[np.ndarray]:
+    """
+    Async variant of generate_embeddings_batch, used for concurrent batches
+    
+    Args:
+        texts: Texts to embed
+    
+    Returns:
+        float32 embedding vectors in the same order as the input texts
+    """
+    response = await async_openai_client.embeddings.create(
+        model="text-embedding-3-small",
+        input=texts,
+        dimensions=EMBED_DIMS
     )
+    return _to_vectors(response)
+
+def upsert_vectors(vectors: List[Dict[str, Any]], namespace: str, batch_size: int = 100) -> None:
+    """
+    Upsert vectors into Pinecone, sending all batches in parallel
     
-    chunks = text_splitter.split_text(text)
-    return chunks
+    Args:
+        vectors: Vectors to upsert
+        namespace: Pinecone namespace
+        batch_size: Vectors per upsert request (Pinecone has limits)
+    """
+    async_results = [
+        pinecone_index.upsert(vectors=vectors[i:i + batch_size], namespace=namespace, async_req=True)
+        for i in range(0, len(vectors), batch_size)
+    ]
+    # Wait for every batch so failures are raised here
+    for async_result in async_results:
+        async_result.get()
 
-def store_embeddings_in_pinecone(
+async def store_embeddings_in_pinecone(
     chunks: List[str],
     user_id: str,
     doc_id: str,
@@ -113,31 +345,40 @@ def store_embeddings_in_pinecone(
     if not pinecone_index:
         raise Exception("Pinecone index not initialized")
     
+    semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+    
+    async def embed_batch(batch_chunks: List[str]) -> List[np.ndarray]:
+        async with semaphore:
+            return await generate_embeddings_batch_async(batch_chunks)
+    
+    # Generate embeddings for all batches concurrently
+    starts = range(0, len(chunks), EMBEDDING_BATCH_SIZE)
+    batch_results = await asyncio.gather(
+        *[embed_batch(chunks[start:start + EMBEDDING_BATCH_SIZE]) for start in starts],
+        return_exceptions=True
+    )
+    
     vectors = []
     
-    for i, chunk in enumerate(chunks):
-        try:
-            # Generate embedding for the chunk
-            embedding = generate_embedding(chunk)
-            
+    for start, embeddings in zip(starts, batch_results):
+        batch_chunks = chunks[start:start + EMBEDDING_BATCH_SIZE]
+        if isinstance(embeddings, Exception):
+            logger.warning("Error processing chunks %d-%d: %s", start, start + len(batch_chunks) - 1, embeddings)
+            continue
+        
+        for i, (chunk, embedding) in enumerate(zip(batch_chunks, embeddings), start):
             # Create vector with metadata
             vector = {
-                "id": f"{doc_id}_chunk_{i}",
-                "values": embedding,
+                "id": vector_id(doc_id, i),
+                "values": embedding,  # float32 array; the Pinecone client converts it on upsert
                 "metadata": {
                     "user_id": user_id,
                     "doc_id": doc_id,
                     "doc_name": filename,
-                    "chunk_id": i,
-                    "text": chunk[:1000],  # Store first 1000 chars for retrieval
-                    "chunk_length": len(chunk)
+                    "chunk_id": i
                 }
             }
             vectors.append(vector)
-            
-        except Exception as e:
-            print(f"Error processing chunk {i}: {e}")
-            continue
     
     if not vectors:
         raise Exception("No vectors generated from chunks")
@@ -146,19 +387,19 @@ def store_embeddings_in_pinecone(
     namespace = f"user_{user_id}"
     
     try:
-        # Upsert vectors in batches (Pinecone has limits)
-        batch_size = 100
-        for i in range(0, len(vectors), batch_size):
-            batch = vectors[i:i + batch_size]
-            pinecone_index.upsert(vectors=batch, namespace=namespace)
-            
-        print(f"Successfully stored {len(vectors)} vectors for document {doc_id}")
+        # Chunk texts go to GCS before the vectors that reference them
+        await _run_ingest_io(store_chunk_texts, chunks, user_id, doc_id)
+        
+        # The Pinecone client is blocking, so keep it off the event loop
+        await _run_ingest_io(upsert_vectors, vectors, namespace)
+        
+        logger.info("Successfully stored %d vectors for document %s", len(vectors), doc_id)
         
     except Exception as e:
-        print(f"Error storing vectors in Pinecone: {e}")
+        logger.error("Error storing vectors in Pinecone: %s", e)
         raise
 
-def process_document_embeddings(
+async def process_document_embeddings(
     user_id: str,
     doc_id: str,
     gcp_path: str,
@@ -175,48 +416,38 @@ def process_document_embeddings(
         filename: Original filename
     """
     try:
-        print(f"Starting embedding processing for document {doc_id}")
+        logger.info("Starting embedding processing for document %s", doc_id)
         
         # Update status to processing
-        update_embedding_status(doc_id, 'processing')
+        await _run_ingest_io(update_embedding_status, doc_id, 'processing')
         
         # Step 1: Download file from GCP
-        file_content = download_from_gcp(gcp_path)
+        file_content = await download_from_gcp_async(gcp_path)
         
-        # Step 2: Extract text from file
-        print(f"Extracting text from {filename}")
-        text = extract_text_from_file(file_content, filename)
-        
-        if not text.strip():
-            raise Exception("No text extracted from file")
-        
-        print(f"Extracted {len(text)} characters of text")
-        
-        # Step 3: Chunk the text
-        print("Chunking text...")
-        chunks = chunk_text(text)
-        print(f"Created {len(chunks)} chunks")
+        # Steps 2-3: Extract and chunk the text in the parse pool
+        logger.debug("Extracting text from %s", filename)
+        chunks = await _run_in_parse_pool(parse_document, file_content, filename)
+        logger.debug("Created %d chunks", len(chunks))
         
         if not chunks:
             raise Exception("No chunks created from text")
         
         # Step 4: Generate embeddings and store in Pinecone
-        print("Generating and storing embeddings...")
+        logger.debug("Generating and storing embeddings")
         
         if pinecone_index:
-            store_embeddings_in_pinecone(chunks, user_id, doc_id, filename)
+            await store_embeddings_in_pinecone(chunks, user_id, doc_id, filename)
         else:
-            print("Pinecone not available - skipping embedding storage")
-            print("File processed successfully but embeddings not stored")
+            logger.warning("Pinecone not available - file processed but embeddings not stored")
         
         # Step 5: Update status to completed
-        update_embedding_status(doc_id, 'completed')
-        print(f"Successfully completed embedding processing for document {doc_id}")
+        await _run_ingest_io(update_embedding_status, doc_id, 'completed')
+        logger.info("Successfully completed embedding processing for document %s", doc_id)
         
     except Exception as e:
-        print(f"Error processing embeddings for document {doc_id}: {e}")
+        logger.error("Error processing embeddings for document %s: %s", doc_id, e)
         # Update status to failed
-        update_embedding_status(doc_id, 'failed')
+        await _run_ingest_io(update_embedding_status, doc_id, 'failed')
         raise
 
 def delete_document_embeddings(user_id: str, doc_id: str) -> bool:
@@ -231,31 +462,25 @@ def delete_document_embeddings(user_id: str, doc_id: str) -> bool:
         True if successful, False otherwise
     """
     if not pinecone_index:
-        print("Pinecone index not initialized")
+        logger.warning("Pinecone index not initialized")
         return False
     
     try:
         namespace = f"user_{user_id}"
+        _forget_chunk_texts(user_id, doc_id)
         
-        # Query to find all vectors for this document
-        query_response = pinecone_index.query(
-            vector=[0.0] * 1536,  # Dummy vector for metadata filtering
-            filter={"doc_id": doc_id},
-            namespace=namespace,
-            top_k=10000,  # Large number to get all matches
-            include_metadata=False
-        )
-        
-        # Extract vector IDs
-        vector_ids = [match.id for match in query_response.matches]
+        # Walk the ID index by prefix (no vector query or metadata scan) and
+        # delete each page of IDs as it arrives
+        deleted = 0
+        for vector_ids in pinecone_index.list(prefix=vector_id_prefix(doc_id), namespace=namespace):
+            if vector_ids:
+                pinecone_index.delete(ids=vector_ids, namespace=namespace)
+                deleted += len(vector_ids)
         
-        if vector_ids:
-            # Delete vectors
-            pinecone_index.delete(ids=vector_ids, namespace=namespace)
-            print(f"Deleted {len(vector_ids)} vectors for document {doc_id}")
+        logger.info("Deleted %d vectors for document %s", deleted, doc_id)
         
         return True
         
     except Exception as e:
-        print(f"Error deleting embeddings for document {doc_id}: {e}")
+        logger.error("Error deleting embeddings for document %s: %s", doc_id, e)
         return False
\ No newline at end of file
@@ -1,9 +1,12 @@
 import io
-import PyPDF2
+import logging
+import pypdf
 from docx import Document
 from pptx import Presentation
 from fastapi import HTTPException
 
+logger = logging.getLogger(__name__)
+
 def extract_text_from_pdf(file_content: bytes) -> str:
     """
     Extract text from PDF file
@@ -15,27 +18,27 @@ def extract_text_from_pdf(file_content: bytes) -> str:
         Extracted text as string
     """
     try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-        text = ""
+        pdf_reader = pypdf.PdfReader(io.BytesIO(file_content))
+        parts = []
         
         for page in pdf_reader.pages:
             try:
                 page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+                if page_text and page_text.strip():
+                    parts.append(page_text)
             except Exception as e:
-                print(f"Error extracting text from PDF page: {e}")
+                logger.warning("Error extracting text from PDF page: %s", e)
                 continue
         
-        if not text.strip():
+        if not parts:
             raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
         
-        return text.strip()
+        return "\n".join(parts).strip()
         
-    except PyPDF2.errors.PdfReadError as e:
+    except pypdf.errors.PdfReadError as e:
         raise HTTPException(status_code=400, detail=f"Invalid PDF file: {str(e)}")
     except Exception as e:
-        print(f"Error processing PDF: {e}")
+        logger.error("Error processing PDF: %s", e)
         raise HTTPException(status_code=500, detail="Failed to process PDF file")
 
 def extract_text_from_docx(file_content: bytes) -> str:
@@ -50,27 +53,27 @@ def extract_text_from_docx(file_content: bytes) -> str:
     """
     try:
         doc = Document(io.BytesIO(file_content))
-        text = ""
+        parts = []
         
         # Extract text from paragraphs
         for paragraph in doc.paragraphs:
             if paragraph.text.strip():
-                text += paragraph.text + "\n"
+                parts.append(paragraph.text)
         
         # Extract text from tables
         for table in doc.tables:
             for row in table.rows:
                 for cell in row.cells:
                     if cell.text.strip():
-                        text += cell.text + "\n"
+                        parts.append(cell.text)
         
-        if not text.strip():
+        if not parts:
             raise HTTPException(status_code=400, detail="No text could be extracted from the DOCX file")
         
-        return text.strip()
+        return "\n".join(parts).strip()
         
     except Exception as e:
-        print(f"Error processing DOCX: {e}")
+        logger.error("Error processing DOCX: %s", e)
         raise HTTPException(status_code=500, detail="Failed to process DOCX file")
 
 def extract_text_from_pptx(file_content: bytes) -> str:
@@ -85,14 +88,15 @@ def extract_text_from_pptx(file_content: bytes) -> str:
     """
     try:
         presentation = Presentation(io.BytesIO(file_content))
-        text = ""
+        parts = []
         
         for slide_num, slide in enumerate(presentation.slides, 1):
-            slide_text = f"Slide {slide_num}:\n"
+            slide_bits = []
             
             for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text.strip():
-                    slide_text += shape.text + "\n"
+                shape_text = getattr(shape, "text", None)
+                if shape_text and shape_text.strip():
+                    slide_bits.append(shape_text)
                 
                 # Extract text from tables in slides
                 if shape.has_table:
@@ -100,18 +104,21 @@ def extract_text_from_pptx(file_content: bytes) -> str:
                     for row in table.rows:
                         for cell in row.cells:
                             if cell.text.strip():
-                                slide_text += cell.text + "\n"
+                                slide_bits.append(cell.text)
             
-            if slide_text.strip() != f"Slide {slide_num}:":
-                text += slide_text + "\n"
+            # Skip empty slides; keep a blank line between slides
+            if slide_bits:
+                parts.append(f"Slide {slide_num}:")
+                parts.extend(slide_bits)
+                parts.append("")
         
-        if not text.strip():
+        if not parts:
             raise HTTPException(status_code=400, detail="No text could be extracted from the PPTX file")
         
-        return text.strip()
+        return "\n".join(parts).strip()
         
     except Exception as e:
-        print(f"Error processing PPTX: {e}")
+        logger.error("Error processing PPTX: %s", e)
         raise HTTPException(status_code=500, detail="Failed to process PPTX file")
 
 def extract_text_from_file(file_content: bytes, filename: str) -> str:
@@ -1,17 +1,31 @@
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 from pydantic import BaseModel
 import os
 import uuid
+import json
+import asyncio
+import logging
+import queue
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from redis.exceptions import RedisError
 
 # Load environment variables
 load_dotenv()
 
+# Configure logging once for the whole app; set LOG_LEVEL=WARNING in
+# production to skip debug/info message formatting entirely
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'))
+logger = logging.getLogger(__name__)
+
 # Import our modules
 from auth import verify_firebase_token, create_jwt_token, verify_jwt_token
-from storage import upload_to_gcp
+from storage import upload_to_gcp_async, open_async_storage, close_async_storage, signed_url_for_download
 from database import (
     save_document_metadata, 
     get_user_documents, 
@@ -19,14 +33,55 @@ from database import (
     get_document_by_id
 )
 from file_processor import validate_file_type, validate_file_size
-from embedding_service import process_document_embeddings
-from search_service import search_and_generate_response, get_document_statistics
+from embedding_service import (
+    process_document_embeddings,
+    embedding_queue,
+    warm_up_pinecone,
+    EMBEDDING_JOB_TIMEOUT
+)
+from search_service import (
+    search_and_generate_response,
+    stream_search_and_generate_response,
+    is_smalltalk_query,
+    SMALLTALK_RESPONSE,
+    get_document_statistics
+)
+
+def start_log_listener() -> QueueListener:
+    """
+    Route root log records through a queue drained by a background thread
+    
+    Request handlers then only enqueue records; formatting and writing to
+    the configured handlers happens off the event loop.
+    """
+    root = logging.getLogger()
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+    root.handlers = [QueueHandler(log_queue)]
+    listener.start()
+    return listener
+
+def stop_log_listener(listener: QueueListener) -> None:
+    """Flush queued log records and restore the original root handlers"""
+    listener.stop()
+    logging.getLogger().handlers = list(listener.handlers)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared clients at startup and close them at shutdown"""
+    log_listener = start_log_listener()
+    await open_async_storage()
+    await asyncio.to_thread(warm_up_pinecone)
+    yield
+    await close_async_storage()
+    stop_log_listener(log_listener)
 
 # Initialize FastAPI app
 app = FastAPI(
     title="RAG Document Management API",
     description="Secure document upload and AI-powered search system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS Configuration - Add your frontend URLs here
@@ -46,6 +101,13 @@ app.add_middleware(
 # Security
 security = HTTPBearer()
 
+# MIME types of supported upload extensions
+CONTENT_TYPE_MAP = {
+    'pdf': 'application/pdf',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+}
+
 # Pydantic models for request/response
 class AuthRequest(BaseModel):
     firebase_token: str
@@ -71,7 +133,12 @@ class FileResponse(BaseModel):
 
 # Dependency to get current user from JWT token
 async def get_current_user(credentials = Depends(security)) -> str:
-    """Extract user_id from JWT token"""
+    """
+    Extract user_id from JWT token
+    
+    Repeat calls with the same token are served from verify_jwt_token's
+    cache of verified payloads, so polling endpoints skip signature checks.
+    """
     token = credentials.credentials
     payload = verify_jwt_token(token)
     return payload["user_id"]
@@ -112,8 +179,10 @@ async def authenticate(auth_request: AuthRequest):
             email=email
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Authentication error: {e}")
+        logger.exception("Authentication error")
         raise HTTPException(status_code=401, detail=f"Authentication failed: {str(e)}")
 
 @app.post("/upload", response_model=FileResponse)
@@ -133,9 +202,12 @@ async def upload_document(
                 detail="Invalid file type. Supported formats: PDF, DOCX, PPTX"
             )
         
-        # Read file content and validate size
-        file_content = await file.read()
-        file_size = len(file_content)
+        # Validate size without reading the file into memory
+        file_size = file.size
+        if file_size is None:
+            file.file.seek(0, os.SEEK_END)
+            file_size = file.file.tell()
+            file.file.seek(0)
         
         if not validate_file_size(file_size):
             raise HTTPException(
@@ -147,17 +219,12 @@ async def upload_document(
         doc_id = str(uuid.uuid4())
         
         # Determine file type
-        file_extension = file.filename.lower().split('.')[-1]
-        content_type_map = {
-            'pdf': 'application/pdf',
-            'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
-        }
-        file_type = content_type_map.get(file_extension, 'application/octet-stream')
+        file_extension = os.path.splitext(file.filename)[1].lstrip('.').lower()
+        file_type = CONTENT_TYPE_MAP.get(file_extension, 'application/octet-stream')
         
         # Upload file to GCP Storage
         gcp_path = f"{user_id}/{doc_id}/{file.filename}"
-        upload_to_gcp(file_content, gcp_path)
+        await upload_to_gcp_async(file.file, gcp_path, file_type)
         
         # Save metadata to database
         save_document_metadata(
@@ -169,14 +236,33 @@ async def upload_document(
             gcp_path=gcp_path
         )
         
-        # Trigger background embedding processing
-        background_tasks.add_task(
-            process_document_embeddings,
-            user_id=user_id,
-            doc_id=doc_id,
-            gcp_path=gcp_path,
-            filename=file.filename
-        )
+        # Trigger background embedding processing, on the worker queue when available
+        enqueued = False
+        if embedding_queue:
+            try:
+                await asyncio.to_thread(
+                    embedding_queue.enqueue,
+                    process_document_embeddings,
+                    user_id=user_id,
+                    doc_id=doc_id,
+                    gcp_path=gcp_path,
+                    filename=file.filename,
+                    job_timeout=EMBEDDING_JOB_TIMEOUT
+                )
+                enqueued = True
+            except RedisError:
+                # The file and its row already exist; process in-process
+                # rather than leave the document pending forever
+                logger.exception("Failed to enqueue embedding job for document %s", doc_id)
+        
+        if not enqueued:
+            background_tasks.add_task(
+                process_document_embeddings,
+                user_id=user_id,
+                doc_id=doc_id,
+                gcp_path=gcp_path,
+                filename=file.filename
+            )
         
         return FileResponse(
             doc_id=doc_id,
@@ -188,7 +274,7 @@ async def upload_document(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Upload error: {e}")
+        logger.exception("Upload error")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @app.get("/files")
@@ -201,16 +287,28 @@ async def list_files(user_id: str = Depends(get_current_user)):
         return {"files": files}
         
     except Exception as e:
-        print(f"Error fetching files: {e}")
+        logger.exception("Error fetching files")
         raise HTTPException(status_code=500, detail=f"Failed to fetch files: {str(e)}")
 
+def sse_response(events) -> StreamingResponse:
+    """Wrap an iterable of event dicts as a server-sent events response"""
+    return StreamingResponse(
+        (f"data: {json.dumps(event)}\n\n" for event in events),
+        media_type="text/event-stream"
+    )
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(
     chat_request: ChatRequest,
+    request: Request,
     user_id: str = Depends(get_current_user)
 ):
     """
     Query user's documents and get AI response
+    
+    Clients sending `Accept: text/event-stream` get the response as
+    server-sent events: token events as the answer is generated, then a
+    final sources event. Other clients get a single JSON ChatResponse.
     """
     try:
         query = chat_request.query.strip()
@@ -221,8 +319,23 @@ async def chat(
         if len(query) > 1000:
             raise HTTPException(status_code=400, detail="Query too long (max 1000 characters)")
         
+        wants_stream = "text/event-stream" in request.headers.get("accept", "")
+        
+        # Greetings and very short queries skip the embedding + Pinecone round-trips
+        if is_smalltalk_query(query):
+            if wants_stream:
+                return sse_response([
+                    {"type": "token", "content": SMALLTALK_RESPONSE},
+                    {"type": "sources", "sources": []}
+                ])
+            return ChatResponse(response=SMALLTALK_RESPONSE, sources=[])
+        
+        if wants_stream:
+            # Sync generator: Starlette iterates it in a threadpool
+            return sse_response(stream_search_and_generate_response(query, user_id))
+        
         # Search documents and generate response
-        result = search_and_generate_response(query, user_id)
+        result = await search_and_generate_response(query, user_id)
         
         return ChatResponse(
             response=result["response"],
@@ -232,7 +345,7 @@ async def chat(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Chat error: {e}")
+        logger.exception("Chat error")
         raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
 @app.get("/stats")
@@ -241,17 +354,14 @@ async def get_stats(user_id: str = Depends(get_current_user)):
     Get user's document statistics
     """
     try:
-        # Get database stats
-        user_documents = get_user_documents(user_id)
-        
-        # Get Pinecone stats
-        pinecone_stats = get_document_statistics(user_id)
+        # Database and Pinecone stats are independent, so fetch them concurrently
+        user_documents, pinecone_stats = await asyncio.gather(
+            asyncio.to_thread(get_user_documents, user_id),
+            asyncio.to_thread(get_document_statistics, user_id)
+        )
         
         # Calculate status distribution
-        status_counts = {}
-        for doc in user_documents:
-            status = doc.get('embedding_status', 'unknown')
-            status_counts[status] = status_counts.get(status, 0) + 1
+        status_counts = dict(Counter(doc.get('embedding_status', 'unknown') for doc in user_documents))
         
         return {
             "total_documents": len(user_documents),
@@ -261,9 +371,35 @@ async def get_stats(user_id: str = Depends(get_current_user)):
         }
         
     except Exception as e:
-        print(f"Stats error: {e}")
+        logger.exception("Stats error")
         raise HTTPException(status_code=500, detail=f"Failed to get stats: {str(e)}")
 
+@app.get("/documents/{doc_id}/download")
+async def download_document(
+    doc_id: str,
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Redirect to a short-lived signed URL for the document's original file
+    
+    The browser downloads straight from GCS, so file bytes never pass
+    through the API.
+    """
+    try:
+        document = await asyncio.to_thread(get_document_by_id, doc_id, user_id)
+        
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+        
+        url = await asyncio.to_thread(signed_url_for_download, document['gcp_path'])
+        return RedirectResponse(url)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Download error")
+        raise HTTPException(status_code=500, detail=f"Download failed: {str(e)}")
+
 @app.delete("/documents/{doc_id}")
 async def delete_document(
     doc_id: str,
@@ -290,7 +426,7 @@ async def delete_document(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Delete error: {e}")
+        logger.exception("Delete error")
         raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
 
 # Error handlers
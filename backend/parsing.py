@@ -0,0 +1,96 @@
+import logging
+from functools import lru_cache
+from typing import List
+from fastapi import HTTPException
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from file_processor import extract_text_from_file
+
+# Code run inside the parse process pool. Kept apart from embedding_service so
+# worker processes import only the extractors and the splitter, never the
+# OpenAI, Pinecone, Redis or GCS clients.
+
+logger = logging.getLogger(__name__)
+
+# Chunk sizes are measured in cl100k_base tokens, the encoding used by
+# text-embedding-3-small
+CHUNK_SIZE_TOKENS = 512
+CHUNK_OVERLAP_TOKENS = 64
+TEXT_SPLITTER_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+class DocumentParseError(Exception):
+    """
+    Picklable stand-in for an extractor's HTTPException
+    
+    HTTPException is built from keyword arguments only, so it cannot be
+    unpickled in the parent; one escaping a worker breaks the whole pool.
+    """
+    
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+@lru_cache(maxsize=8)
+def _get_text_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """Get a token-based text splitter, built once per (chunk_size, chunk_overlap)"""
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name="cl100k_base",
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=TEXT_SPLITTER_SEPARATORS
+    )
+
+# Build the default splitter (and load the tiktoken encoding) at import
+_get_text_splitter(CHUNK_SIZE_TOKENS, CHUNK_OVERLAP_TOKENS)
+
+def chunk_text(
+    text: str,
+    chunk_size: int = CHUNK_SIZE_TOKENS,
+    chunk_overlap: int = CHUNK_OVERLAP_TOKENS
+) -> List[str]:
+    """
+    Split text into chunks for embedding
+    
+    Args:
+        text: Text to split
+        chunk_size: Maximum size of each chunk in tokens
+        chunk_overlap: Overlap between chunks in tokens
+    
+    Returns:
+        List of text chunks
+    """
+    return _get_text_splitter(chunk_size, chunk_overlap).split_text(text)
+
+def parse_document(file_content: bytes, filename: str) -> List[str]:
+    """
+    Extract and chunk a document in a parse worker, raising only picklable errors
+    
+    Both steps are CPU-bound (parsing, then tiktoken-based splitting), so
+    neither runs on the event loop.
+    
+    Args:
+        file_content: File content as bytes
+        filename: Original filename, used to pick the extractor
+    
+    Returns:
+        List of text chunks
+    """
+    try:
+        text = extract_text_from_file(file_content, filename)
+    except HTTPException as e:
+        raise DocumentParseError(e.status_code, e.detail) from None
+    
+    if not text.strip():
+        raise Exception("No text extracted from file")
+    
+    logger.debug("Extracted %d characters of text", len(text))
+    return chunk_text(text)
+
+def init_parse_worker(log_level: int) -> None:
+    """
+    Give a parse worker stderr logging at the API process's level
+    
+    Workers start from a fresh interpreter, so they have no handlers of
+    their own and would otherwise drop everything below WARNING.
+    """
+    logging.basicConfig(level=log_level)
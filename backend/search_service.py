@@ -1,11 +1,151 @@
 from openai import OpenAI
 import os
-from typing import List, Dict, Any, Tuple
-from embedding_service import generate_embedding, pinecone_index
+import re
+import logging
+import asyncio
+import heapq
+import hashlib
+import threading
+import numpy as np
+import tiktoken
+from functools import lru_cache
+from cachetools import TTLCache
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Iterator, Optional
+from embedding_service import (
+    generate_embedding,
+    generate_embeddings_batch,
+    pinecone_index,
+    load_chunk_texts,
+    redis_client,
+    EMBED_DIMS,
+    PINECONE_POOL_THREADS
+)
+
+logger = logging.getLogger(__name__)
 
 # Initialize OpenAI
 openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
+# Threads for issuing several Pinecone queries concurrently
+_QUERY_POOL = ThreadPoolExecutor(max_workers=PINECONE_POOL_THREADS)
+
+# Context layout: each chunk is "[From {doc_name}]: {text}", separated by blank lines
+CONTEXT_SEPARATOR = "\n\n"
+
+# Tokenizer for gpt-3.5-turbo, used to budget the context in real tokens
+_ENC = tiktoken.get_encoding("cl100k_base")
+_SEPARATOR_TOKENS = len(_ENC.encode_ordinary(CONTEXT_SEPARATOR))
+
+# Context token budget, leaving room for the system prompt, query and completion
+MAX_CONTEXT_TOKENS = 3000
+
+# Canned responses
+NO_CONTEXT_RESPONSE = "I couldn't find any relevant information in your documents to answer that question."
+NO_DOCUMENTS_RESPONSE = "I couldn't find any relevant information in your documents to answer that question. Please make sure you have uploaded documents and they have been processed successfully."
+ERROR_RESPONSE = "I'm sorry, I encountered an error while processing your question. Please try again later."
+
+# Upper bound on sub-questions searched for a single chat message
+MAX_SUB_QUESTIONS = 5
+
+# Greetings and acknowledgements answered without a search
+SMALLTALK_QUERIES = frozenset({
+    "hi", "hii", "hey", "hello", "yo", "thanks", "thank you", "thx", "ty",
+    "ok", "okay", "cool", "bye", "good morning", "good evening"
+})
+SMALLTALK_RESPONSE = "Hi! Ask me a question about your documents."
+
+# Queries shorter than this carry too little to search on
+MIN_QUERY_LENGTH = 4
+
+# Short-lived cache of index stats for /stats polling
+_stats_cache = TTLCache(maxsize=1, ttl=int(os.getenv('STATS_CACHE_TTL', 10)))
+_stats_cache_lock = threading.Lock()
+
+# Lifetime of query embeddings shared through Redis, in seconds
+QUERY_EMBEDDING_TTL = 24 * 60 * 60
+
+def normalize_query(query: str) -> str:
+    """Normalize case and whitespace so equivalent queries share a cache entry"""
+    return " ".join(query.lower().split())
+
+@lru_cache(maxsize=2048)
+def _cached_query_embedding(normalized_query: str) -> Tuple[float, ...]:
+    """
+    Embed a normalized query, caching per process and, if configured, in Redis
+    
+    Redis lets worker processes share embeddings; entries are stored as
+    float32 bytes keyed by the embedding size and a hash of the query.
+    """
+    key = f"query_embedding:{EMBED_DIMS}:{hashlib.sha256(normalized_query.encode()).hexdigest()}"
+    
+    if redis_client:
+        try:
+            cached = redis_client.get(key)
+            if cached:
+                return tuple(np.frombuffer(cached, dtype=np.float32).tolist())
+        except Exception as e:
+            logger.warning("Error reading query embedding cache: %s", e)
+    
+    embedding = generate_embedding(normalized_query)
+    
+    if redis_client:
+        try:
+            redis_client.set(key, np.asarray(embedding, dtype=np.float32).tobytes(), ex=QUERY_EMBEDDING_TTL)
+        except Exception as e:
+            logger.warning("Error writing query embedding cache: %s", e)
+    
+    return tuple(embedding)
+
+def get_query_embedding(query: str) -> List[float]:
+    """
+    Get the embedding for a search query, reusing cached embeddings
+    
+    Args:
+        query: User's search query
+    
+    Returns:
+        Embedding vector as list of floats
+    """
+    return list(_cached_query_embedding(normalize_query(query)))
+
+def is_smalltalk_query(query: str) -> bool:
+    """
+    Check whether a query is a greeting or too short to be worth searching
+    
+    Such queries only pull noise out of Pinecone, so callers answer them
+    with SMALLTALK_RESPONSE and skip the embedding and query round-trips.
+    """
+    query = query.strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        return True
+    # Punctuation is ignored only for the greeting match, so "why?" is still searched
+    return query.lower().rstrip("!.?, ") in SMALLTALK_QUERIES
+
+def format_matches(matches) -> List[Dict[str, Any]]:
+    """
+    Convert Pinecone matches into search result dictionaries
+    
+    Args:
+        matches: Matches from a Pinecone query response
+    
+    Returns:
+        List of search results
+    """
+    results = []
+    for match in matches:
+        result = {
+            "id": match.id,
+            "score": match.score,
+            "metadata": match.metadata,
+            "text": match.metadata.get("text", ""),
+            "doc_name": match.metadata.get("doc_name", ""),
+            "doc_id": match.metadata.get("doc_id", ""),
+            "chunk_id": match.metadata.get("chunk_id", 0)
+        }
+        results.append(result)
+    return results
+
 def search_similar_documents(
     query: str,
     user_id: str,
@@ -27,7 +167,7 @@ def search_similar_documents(
     
     try:
         # Generate embedding for the query
-        query_embedding = generate_embedding(query)
+        query_embedding = get_query_embedding(query)
         
         # Search in user-specific namespace
         namespace = f"user_{user_id}"
@@ -42,63 +182,170 @@ def search_similar_documents(
         )
         
         # Format results
-        results = []
-        for match in search_results.matches:
-            result = {
-                "id": match.id,
-                "score": match.score,
-                "metadata": match.metadata,
-                "text": match.metadata.get("text", ""),
-                "doc_name": match.metadata.get("doc_name", ""),
-                "doc_id": match.metadata.get("doc_id", ""),
-                "chunk_id": match.metadata.get("chunk_id", 0)
-            }
-            results.append(result)
+        results = format_matches(search_results.matches)
+        
+        attach_chunk_texts(results, user_id)
         
         return results
         
-    except Exception as e:
-        print(f"Error searching documents: {e}")
+    except Exception:
+        logger.exception("Error searching documents")
         raise
 
-def generate_response_with_context(
+def search_batch(
+    queries: List[str],
+    user_id: str,
+    top_k: int = 5
+) -> List[List[Dict[str, Any]]]:
+    """
+    Search for several queries at once
+    
+    All queries are embedded in one OpenAI request and their Pinecone
+    queries are issued concurrently.
+    
+    Args:
+        queries: Search queries
+        user_id: User ID for namespace isolation
+        top_k: Number of top results to return per query
+    
+    Returns:
+        One list of search results per query, in query order
+    """
+    if not pinecone_index:
+        raise Exception("Pinecone index not initialized")
+    
+    try:
+        embeddings = generate_embeddings_batch(queries)
+        namespace = f"user_{user_id}"
+        
+        futures = [
+            _QUERY_POOL.submit(
+                pinecone_index.query,
+                vector=embedding.tolist(),
+                namespace=namespace,
+                top_k=top_k,
+                include_metadata=True,
+                include_values=False
+            )
+            for embedding in embeddings
+        ]
+        all_results = [format_matches(future.result().matches) for future in futures]
+        
+        # Fetch chunk texts once across all queries
+        attach_chunk_texts([result for results in all_results for result in results], user_id)
+        
+        return all_results
+        
+    except Exception:
+        logger.exception("Error searching documents")
+        raise
+
+def split_sub_questions(query: str) -> List[str]:
+    """
+    Split a chat message into its individual questions
+    
+    Args:
+        query: User's message
+    
+    Returns:
+        The questions in the message (the whole message if it has at most one)
+    """
+    parts = [part.strip() for part in re.split(r"(?<=\?)\s+", query) if part.strip()]
+    return parts[:MAX_SUB_QUESTIONS] if len(parts) > 1 else [query]
+
+def merge_search_results(result_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Merge results from several searches, keeping each chunk once with its best score
+    
+    Args:
+        result_lists: Search results per query
+    
+    Returns:
+        Unique results sorted by score (highest first)
+    """
+    merged = {}
+    for results in result_lists:
+        for result in results:
+            existing = merged.get(result["id"])
+            if existing is None or existing["score"] < result["score"]:
+                merged[result["id"]] = result
+    return sorted(merged.values(), key=lambda result: result["score"], reverse=True)
+
+def attach_chunk_texts(results: List[Dict[str, Any]], user_id: str) -> None:
+    """
+    Fill in chunk text for search results whose vectors carry no text
+    
+    Chunk texts live in GCS; each document's chunk file is read once no
+    matter how many of its chunks matched, and files for different
+    documents are downloaded concurrently. Older vectors still store text
+    in metadata and are left as they are.
+    
+    Args:
+        results: Formatted search results, updated in place
+        user_id: User ID owning the documents
+    """
+    missing_doc_ids = list({result["doc_id"] for result in results if not result["text"]})
+    
+    def load(doc_id: str) -> Optional[Dict[int, str]]:
+        try:
+            return load_chunk_texts(user_id, doc_id)
+        except Exception as e:
+            logger.warning("Error loading chunk texts for document %s: %s", doc_id, e)
+            return None
+    
+    for doc_id, texts in zip(missing_doc_ids, _QUERY_POOL.map(load, missing_doc_ids)):
+        if texts is None:
+            continue
+        
+        for result in results:
+            if result["doc_id"] == doc_id and not result["text"]:
+                result["text"] = texts.get(int(result["chunk_id"]), "")
+
+def build_chat_messages(
     query: str,
     context_chunks: List[Dict[str, Any]],
-    max_context_length: int = 4000
-) -> str:
+    max_context_tokens: int = MAX_CONTEXT_TOKENS
+) -> List[Dict[str, str]]:
     """
-    Generate AI response using retrieved context
+    Build the chat completion messages for a query and its retrieved context
     
     Args:
         query: User's query
         context_chunks: Retrieved document chunks
-        max_context_length: Maximum length of context to include
+        max_context_tokens: Maximum number of context tokens to include
     
     Returns:
-        AI-generated response
+        System and user messages for the chat completion
     """
-    if not context_chunks:
-        return "I couldn't find any relevant information in your documents to answer that question."
-    
-    # Build context from chunks
-    context_parts = []
-    current_length = 0
+    # Format each chunk with a document name prefix for citation
+    entries = []
+    seen = set()
     
     for chunk in context_chunks:
         text = chunk.get("text", "")
         doc_name = chunk.get("doc_name", "Unknown Document")
         
-        # Add document name prefix for citation
-        chunk_text = f"[From {doc_name}]: {text}"
+        # Skip chunks whose text (ignoring case and whitespace) is already in context
+        text_hash = hash(normalize_query(text))
+        if text_hash in seen:
+            continue
+        seen.add(text_hash)
         
-        # Check if adding this chunk would exceed max length
-        if current_length + len(chunk_text) > max_context_length:
+        entries.append(f"[From {doc_name}]: {text}")
+    
+    # Count tokens for all entries in one batch, then fill the budget in order
+    token_counts = [len(tokens) for tokens in _ENC.encode_ordinary_batch(entries)] if entries else []
+    included = []
+    used_tokens = 0
+    
+    for entry, entry_tokens in zip(entries, token_counts):
+        needed = entry_tokens + (_SEPARATOR_TOKENS if included else 0)
+        if used_tokens + needed > max_context_tokens:
             break
-        
-        context_parts.append(chunk_text)
-        current_length += len(chunk_text)
+        included.append(entry)
+        used_tokens += needed
     
-    context = "\n\n".join(context_parts)
+    context = CONTEXT_SEPARATOR.join(included)
     
     # Build the prompt
     system_prompt = """You are a helpful assistant that answers questions based on provided document context. 
@@ -117,24 +364,77 @@ Question: {query}
 
 Please provide a clear answer based on the context above."""
     
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def generate_response_with_context(
+    query: str,
+    context_chunks: List[Dict[str, Any]],
+    max_context_tokens: int = MAX_CONTEXT_TOKENS
+) -> str:
+    """
+    Generate AI response using retrieved context
+    
+    Args:
+        query: User's query
+        context_chunks: Retrieved document chunks
+        max_context_tokens: Maximum number of context tokens to include
+    
+    Returns:
+        AI-generated response
+    """
+    if not context_chunks:
+        return NO_CONTEXT_RESPONSE
+    
     try:
         # Generate response using OpenAI
         response = openai_client.chat.completions.create(
             model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+            messages=build_chat_messages(query, context_chunks, max_context_tokens),
             temperature=0.7,
             max_tokens=500
         )
         
         return response.choices[0].message.content
         
-    except Exception as e:
-        print(f"Error generating response: {e}")
+    except Exception:
+        logger.exception("Error generating response")
         raise
 
+def stream_response_with_context(
+    query: str,
+    context_chunks: List[Dict[str, Any]],
+    max_context_tokens: int = MAX_CONTEXT_TOKENS
+) -> Iterator[str]:
+    """
+    Stream an AI response using retrieved context, token by token
+    
+    Args:
+        query: User's query
+        context_chunks: Retrieved document chunks
+        max_context_tokens: Maximum number of context tokens to include
+    
+    Yields:
+        Pieces of the AI-generated response as they arrive
+    """
+    if not context_chunks:
+        yield NO_CONTEXT_RESPONSE
+        return
+    
+    stream = openai_client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=build_chat_messages(query, context_chunks, max_context_tokens),
+        temperature=0.7,
+        max_tokens=500,
+        stream=True
+    )
+    
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
 def extract_source_citations(search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Extract unique source documents with relevance scores
@@ -145,34 +445,53 @@ def extract_source_citations(search_results: List[Dict[str, Any]]) -> List[Dict[
     Returns:
         List of unique sources with highest relevance scores
     """
-    sources = {}
+    # Best (score, doc_id) per document name, in a single pass
+    best = {}
     
     for result in search_results:
         doc_name = result.get("doc_name", "Unknown Document")
         score = result.get("score", 0.0)
-        doc_id = result.get("doc_id", "")
+        previous = best.get(doc_name)
         
         # Keep the highest score for each document
-        if doc_name not in sources or sources[doc_name]["relevance_score"] < score:
-            sources[doc_name] = {
-                "doc_name": doc_name,
-                "doc_id": doc_id,
-                "relevance_score": round(score, 3)
-            }
+        if previous is None or previous[0] < score:
+            best[doc_name] = (score, result.get("doc_id", ""))
     
     # Sort by relevance score (highest first)
-    sorted_sources = sorted(
-        sources.values(),
-        key=lambda x: x["relevance_score"],
-        reverse=True
-    )
+    ranked = heapq.nlargest(len(best), best.items(), key=lambda item: item[1][0])
+    
+    return [
+        {
+            "doc_name": doc_name,
+            "doc_id": doc_id,
+            "relevance_score": round(score, 3)
+        }
+        for doc_name, (score, doc_id) in ranked
+    ]
+
+def retrieve_context(query: str, user_id: str) -> List[Dict[str, Any]]:
+    """
+    Retrieve the document chunks relevant to a chat message
+    
+    Args:
+        query: User's search query
+        user_id: User ID for namespace isolation
     
-    return sorted_sources
+    Returns:
+        Search results, one search per question in the message
+    """
+    sub_questions = split_sub_questions(query)
+    if len(sub_questions) > 1:
+        return merge_search_results(search_batch(sub_questions, user_id, top_k=5))
+    return search_similar_documents(query, user_id, top_k=5)
 
-def search_and_generate_response(query: str, user_id: str) -> Dict[str, Any]:
+async def search_and_generate_response(query: str, user_id: str) -> Dict[str, Any]:
     """
     Complete search and response generation pipeline
     
+    The blocking OpenAI, Pinecone and GCS clients run in worker threads so
+    the event loop keeps serving other requests.
+    
     Args:
         query: User's search query
         user_id: User ID for namespace isolation
@@ -182,16 +501,16 @@ def search_and_generate_response(query: str, user_id: str) -> Dict[str, Any]:
     """
     try:
         # Step 1: Search for similar documents
-        search_results = search_similar_documents(query, user_id, top_k=5)
+        search_results = await asyncio.to_thread(retrieve_context, query, user_id)
         
         if not search_results:
             return {
-                "response": "I couldn't find any relevant information in your documents to answer that question. Please make sure you have uploaded documents and they have been processed successfully.",
+                "response": NO_DOCUMENTS_RESPONSE,
                 "sources": []
             }
         
         # Step 2: Generate response with context
-        response = generate_response_with_context(query, search_results)
+        response = await asyncio.to_thread(generate_response_with_context, query, search_results)
         
         # Step 3: Extract source citations
         sources = extract_source_citations(search_results)
@@ -201,13 +520,60 @@ def search_and_generate_response(query: str, user_id: str) -> Dict[str, Any]:
             "sources": sources
         }
         
-    except Exception as e:
-        print(f"Error in search and response generation: {e}")
+    except Exception:
+        logger.exception("Error in search and response generation")
         return {
-            "response": "I'm sorry, I encountered an error while processing your question. Please try again later.",
+            "response": ERROR_RESPONSE,
             "sources": []
         }
 
+def stream_search_and_generate_response(query: str, user_id: str) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of search_and_generate_response
+    
+    Args:
+        query: User's search query
+        user_id: User ID for namespace isolation
+    
+    Yields:
+        {"type": "token", "content": ...} events while the response is
+        generated, then one {"type": "sources", "sources": [...]} event
+    """
+    sources = []
+    
+    try:
+        search_results = retrieve_context(query, user_id)
+        
+        if not search_results:
+            yield {"type": "token", "content": NO_DOCUMENTS_RESPONSE}
+        else:
+            for token in stream_response_with_context(query, search_results):
+                yield {"type": "token", "content": token}
+            sources = extract_source_citations(search_results)
+            
+    except Exception:
+        logger.exception("Error in streaming search and response generation")
+        yield {"type": "token", "content": ERROR_RESPONSE}
+    
+    yield {"type": "sources", "sources": sources}
+
+def get_index_stats():
+    """
+    Get Pinecone index stats, cached briefly
+    
+    describe_index_stats covers every namespace, so one cached response
+    serves all users polling /stats within the TTL.
+    """
+    with _stats_cache_lock:
+        stats = _stats_cache.get("index")
+    
+    if stats is None:
+        stats = pinecone_index.describe_index_stats()
+        with _stats_cache_lock:
+            _stats_cache["index"] = stats
+    
+    return stats
+
 def get_document_statistics(user_id: str) -> Dict[str, Any]:
     """
     Get statistics about user's documents in Pinecone
@@ -225,7 +591,7 @@ def get_document_statistics(user_id: str) -> Dict[str, Any]:
         namespace = f"user_{user_id}"
         
         # Get index stats for the user's namespace
-        stats = pinecone_index.describe_index_stats()
+        stats = get_index_stats()
         namespace_stats = stats.namespaces.get(namespace, {})
         
         return {
@@ -234,5 +600,5 @@ def get_document_statistics(user_id: str) -> Dict[str, Any]:
         }
         
     except Exception as e:
-        print(f"Error getting document statistics: {e}")
+        logger.exception("Error getting document statistics")
         return {"error": str(e)}
\ No newline at end of file
@@ -1,99 +1,333 @@
 from google.cloud import storage
 from google.oauth2 import service_account
+from gcloud.aio.storage import Storage as AsyncStorage
+import aiohttp
+import asyncio
+import io
 import os
+import re
+import tempfile
 import json
+import mimetypes
+import functools
+import gzip
+import itertools
+import logging
+import threading
+import requests
+from dataclasses import dataclass
+from datetime import timedelta
+from cachetools import TTLCache
 from fastapi import HTTPException
-from typing import Optional
+from typing import Optional, BinaryIO, Dict, Any, List, Tuple, Union
 
-def get_storage_client():
-    """Get Google Cloud Storage client"""
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Settings:
+    """GCS configuration, read from the environment once at import"""
+    project_id: Optional[str]
+    bucket_name: Optional[str]
+    private_key: Optional[str]
+    private_key_id: str
+    client_email: Optional[str]
+    client_id: str
+    credentials_json: Optional[str]
+    pool_size: int
+    
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            project_id=os.getenv('GCP_PROJECT_ID'),
+            bucket_name=os.getenv('GCP_BUCKET_NAME'),
+            private_key=os.getenv('GCP_PRIVATE_KEY'),
+            private_key_id=os.getenv('GCP_PRIVATE_KEY_ID', ''),
+            client_email=os.getenv('GCP_CLIENT_EMAIL'),
+            client_id=os.getenv('GCP_CLIENT_ID', ''),
+            credentials_json=os.getenv('GOOGLE_APPLICATION_CREDENTIALS'),
+            pool_size=int(os.getenv('GCS_POOL_SIZE', 8))
+        )
+
+SETTINGS = Settings.from_env()
+
+# The bucket is resolved once here, so a missing setting fails at startup
+# instead of on the first request
+if not SETTINGS.bucket_name:
+    raise Exception("GCS bucket name not configured. Please set the GCP_BUCKET_NAME environment variable.")
+
+BUCKET_NAME = SETTINGS.bucket_name
+
+# Pool of GCS clients, each with its own HTTP connection pool, built on
+# first use and handed out round-robin; bucket handles are cached per client
+_CLIENT_POOL: List[storage.Client] = []
+_CLIENT_LOCK = threading.Lock()
+_BUCKETS: Dict[int, storage.Bucket] = {}
+_ROUND_ROBIN = itertools.count()
+
+# Connections each pooled client keeps open to storage.googleapis.com
+GCS_HTTP_POOL_MAXSIZE = 32
+
+# Operations per GCS batch request (the JSON API accepts at most 100)
+GCS_BATCH_SIZE = 100
+
+# Service account credentials, parsed once (see _credentials)
+_CREDS = None
+_CREDS_LOADED = False
+_CREDS_LOCK = threading.Lock()
+
+# Uploads at or above this size use chunked resumable uploads
+RESUMABLE_UPLOAD_THRESHOLD = 5 * 1024 * 1024
+
+# Chunk size for resumable uploads (must be a multiple of 256 KB)
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Downloads into a temporary file stay in memory up to this size
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Text artifacts stored gzip-encoded (GCS decompresses them on download),
+# with the content type each is stored under
+COMPRESSIBLE_CONTENT_TYPES = {
+    '.txt': 'text/plain',
+    '.md': 'text/markdown',
+    '.json': 'application/json',
+    '.jsonl': 'application/x-ndjson'
+}
+GZIP_COMPRESS_LEVEL = 5
+
+# Async GCS client for the API process, opened and closed with the app
+_ASYNC_STORAGE: Optional[AsyncStorage] = None
+
+# Maximum concurrent connections held by the async GCS client
+ASYNC_STORAGE_CONNECTION_LIMIT = 200
+
+# Default cap on in-flight requests for upload_many / download_many
+GCS_TRANSFER_CONCURRENCY = 16
+
+# Recent existence checks by path, kept coherent by uploads and deletes
+EXISTS_CACHE_TTL = 30
+_exists_cache = TTLCache(maxsize=10000, ttl=EXISTS_CACHE_TTL)
+_exists_cache_lock = threading.Lock()
+
+# A PEM block plus the newline that usually ends it
+_PEM_BLOCK = re.compile(r'-----BEGIN[^-]+-----.*?-----END[^-]+-----\n?', re.S)
+
+def _fix_pem_newlines(credentials_json: str) -> str:
+    """Escape raw newlines inside PEM key blocks so the JSON string parses"""
+    return _PEM_BLOCK.sub(lambda m: m.group(0).replace('\n', '\\n'), credentials_json)
+
+@functools.lru_cache(maxsize=1)
+def _service_account_info() -> Optional[Dict[str, Any]]:
+    """Service account info from the GCP_* env vars or GOOGLE_APPLICATION_CREDENTIALS JSON"""
+    project_id = SETTINGS.project_id
+    
+    # Try individual environment variables first (more reliable)
+    gcp_private_key = SETTINGS.private_key
+    gcp_client_email = SETTINGS.client_email
+    
+    if gcp_private_key and gcp_client_email:
+        logger.debug("Using individual GCP environment variables")
+        # Construct credentials dict from individual env vars
+        return {
+            "type": "service_account",
+            "project_id": project_id,
+            "private_key_id": SETTINGS.private_key_id,
+            "private_key": gcp_private_key.replace('\\n', '\n'),
+            "client_email": gcp_client_email,
+            "client_id": SETTINGS.client_id,
+            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+            "token_uri": "https://oauth2.googleapis.com/token",
+            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+            "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{gcp_client_email.replace('@', '%40')}",
+            "universe_domain": "googleapis.com"
+        }
+    
+    # Fallback to JSON string method
+    credentials_json = SETTINGS.credentials_json
+    if credentials_json and credentials_json.strip().startswith('{'):
+        try:
+            return json.loads(credentials_json)
+        except json.JSONDecodeError:
+            # Usually a private key pasted with real newlines; escape just those
+            try:
+                return json.loads(_fix_pem_newlines(credentials_json))
+            except json.JSONDecodeError as json_err:
+                logger.warning("JSON method failed: %s", json_err)
+    
+    return None
+
+def _credentials() -> Optional[service_account.Credentials]:
+    """
+    Service account credentials, parsed once per process
+    
+    Parsing the PEM key is the expensive part of client setup, so the
+    credentials object is built under a lock exactly once. Returns None
+    when no service account is configured (default credentials are used).
+    """
+    global _CREDS, _CREDS_LOADED
+    if not _CREDS_LOADED:
+        with _CREDS_LOCK:
+            if not _CREDS_LOADED:
+                credentials_dict = _service_account_info()
+                if credentials_dict:
+                    try:
+                        _CREDS = service_account.Credentials.from_service_account_info(credentials_dict)
+                    except Exception:
+                        logger.exception("Error with service account credentials")
+                _CREDS_LOADED = True
+    return _CREDS
+
+def _build_storage_client() -> storage.Client:
+    """Build a Google Cloud Storage client from the configured credentials"""
     try:
-        project_id = os.getenv('GCP_PROJECT_ID')
+        project_id = SETTINGS.project_id
         
-        # Try individual environment variables first (more reliable)
-        gcp_private_key = os.getenv('GCP_PRIVATE_KEY')
-        gcp_client_email = os.getenv('GCP_CLIENT_EMAIL')
+        credentials = _credentials()
+        if credentials:
+            client = storage.Client(project=project_id, credentials=credentials)
+        else:
+            # Final fallback to default credentials
+            client = storage.Client(project=project_id)
         
-        if gcp_private_key and gcp_client_email:
-            print("Using individual GCP environment variables")
-            try:
-                # Construct credentials dict from individual env vars
-                credentials_dict = {
-                    "type": "service_account",
-                    "project_id": project_id,
-                    "private_key_id": os.getenv('GCP_PRIVATE_KEY_ID', ''),
-                    "private_key": gcp_private_key.replace('\\n', '\n'),
-                    "client_email": gcp_client_email,
-                    "client_id": os.getenv('GCP_CLIENT_ID', ''),
-                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
-                    "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-                    "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{gcp_client_email.replace('@', '%40')}",
-                    "universe_domain": "googleapis.com"
-                }
-                
-                credentials = service_account.Credentials.from_service_account_info(credentials_dict)
-                client = storage.Client(project=project_id, credentials=credentials)
-                print("✅ Successfully initialized GCS client with individual env vars")
-                return client
-            except Exception as e:
-                print(f"Error with individual env vars: {e}")
-        
-        # Fallback to JSON string method
-        credentials_json = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
-        if credentials_json and credentials_json.strip().startswith('{'):
-            try:
-                # Try basic JSON parsing first
-                credentials_dict = json.loads(credentials_json)
-                credentials = service_account.Credentials.from_service_account_info(credentials_dict)
-                client = storage.Client(project=project_id, credentials=credentials)
-                print("✅ Successfully initialized GCS client with JSON credentials")
-                return client
-            except Exception as json_err:
-                print(f"JSON method failed: {json_err}")
-        
-        # Final fallback to default credentials
-        print("⚠️ Using default GCS credentials - file upload may fail")
-        client = storage.Client(project=project_id)
+        # Widen the session's connection pool beyond requests' default of 10
+        client._http.mount("https://", requests.adapters.HTTPAdapter(
+            pool_connections=GCS_HTTP_POOL_MAXSIZE,
+            pool_maxsize=GCS_HTTP_POOL_MAXSIZE
+        ))
         return client
         
-    except Exception as e:
-        print(f"Error initializing GCS client: {e}")
-        print(f"Project ID: {project_id}")
+    except Exception:
+        logger.exception("Error initializing GCS client (project %s)", project_id)
         raise HTTPException(status_code=500, detail="Failed to initialize cloud storage")
 
-def upload_to_gcp(file_content: bytes, gcp_path: str) -> str:
+def _client_pool() -> List[storage.Client]:
+    """Get the GCS client pool, built once per process"""
+    if not _CLIENT_POOL:
+        with _CLIENT_LOCK:
+            if not _CLIENT_POOL:
+                if _credentials() is None:
+                    logger.warning("Using default GCS credentials - file upload may fail")
+                # Publish the pool only once every client built, so a failure
+                # leaves it empty and the next call retries
+                clients = [_build_storage_client() for _ in range(max(SETTINGS.pool_size, 1))]
+                _CLIENT_POOL.extend(clients)
+                logger.debug("Initialized %d GCS clients", len(_CLIENT_POOL))
+    return _CLIENT_POOL
+
+def _next_client_index() -> int:
+    """Index of the next pooled client, in round-robin order"""
+    return next(_ROUND_ROBIN) % len(_client_pool())
+
+def get_storage_client() -> storage.Client:
+    """
+    Get Google Cloud Storage client
+    
+    Clients come from a pool of GCS_POOL_SIZE, handed out round-robin, so
+    concurrent transfers spread over several HTTP connection pools instead
+    of queueing on one. Credentials are parsed once and shared by all.
+    """
+    return _client_pool()[_next_client_index()]
+
+def _get_bucket() -> storage.Bucket:
+    """Get the configured GCS bucket on the next pooled client"""
+    index = _next_client_index()
+    bucket = _BUCKETS.get(index)
+    if bucket is None:
+        bucket = _BUCKETS[index] = _client_pool()[index].bucket(BUCKET_NAME)
+    return bucket
+
+def _remember_exists(gcp_path: str, exists: bool) -> None:
+    """Record whether a path exists in the existence cache"""
+    with _exists_cache_lock:
+        _exists_cache[gcp_path] = exists
+
+def _cached_exists(gcp_path: str) -> Optional[bool]:
+    """Cached existence of a path, or None if unknown"""
+    with _exists_cache_lock:
+        return _exists_cache.get(gcp_path)
+
+def _prepare_upload(
+    file_data: Union[bytes, BinaryIO],
+    gcp_path: str,
+    content_type: Optional[str]
+) -> Tuple[Union[bytes, BinaryIO], str, Optional[str]]:
+    """
+    Apply gzip encoding and a default content type to an upload
+    
+    In-memory bytes for text artifacts (COMPRESSIBLE_CONTENT_TYPES) are
+    gzipped; file objects are left to stream as they are.
+    
+    Returns:
+        The payload to send, its content type and its content encoding
+    """
+    extension = os.path.splitext(gcp_path)[1].lower()
+    content_encoding = None
+    
+    if isinstance(file_data, bytes) and extension in COMPRESSIBLE_CONTENT_TYPES:
+        file_data = gzip.compress(file_data, compresslevel=GZIP_COMPRESS_LEVEL)
+        content_encoding = 'gzip'
+    
+    content_type = (
+        content_type
+        or COMPRESSIBLE_CONTENT_TYPES.get(extension)
+        or mimetypes.guess_type(gcp_path)[0]
+        or 'application/octet-stream'
+    )
+    return file_data, content_type, content_encoding
+
+def upload_to_gcp(
+    file_data: Union[bytes, BinaryIO],
+    gcp_path: str,
+    content_type: Optional[str] = None
+) -> str:
     """
     Upload file to Google Cloud Storage
     
+    File objects are streamed rather than read into memory. Files of
+    RESUMABLE_UPLOAD_THRESHOLD or more go up as a resumable upload in
+    UPLOAD_CHUNK_SIZE pieces, so a failure only retries the chunk in flight.
+    Bytes for text artifacts are stored gzip-encoded (see _prepare_upload);
+    downloads through the client get them decompressed.
+    
     Args:
-        file_content: The file content as bytes
+        file_data: File content as bytes or a seekable binary file object
         gcp_path: The path in GCS bucket (user_id/doc_id/filename)
+        content_type: MIME type to store with the object
     
     Returns:
         The GCS URL of the uploaded file
     """
     try:
-        client = get_storage_client()
-        bucket_name = os.getenv('GCP_BUCKET_NAME')
+        bucket = _get_bucket()
+        blob = bucket.blob(gcp_path)
         
-        if not bucket_name:
-            raise HTTPException(status_code=500, detail="GCS bucket name not configured")
+        file_data, content_type, blob.content_encoding = _prepare_upload(file_data, gcp_path, content_type)
         
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(gcp_path)
+        # Small payloads already in memory go up in a single request
+        if isinstance(file_data, bytes) and len(file_data) < RESUMABLE_UPLOAD_THRESHOLD:
+            blob.upload_from_string(file_data, content_type=content_type)
+            _remember_exists(gcp_path, True)
+            return f"gs://{bucket.name}/{gcp_path}"
         
-        # Upload the file content
-        blob.upload_from_string(file_content)
+        if isinstance(file_data, bytes):
+            file_data = io.BytesIO(file_data)
+        
+        file_data.seek(0, io.SEEK_END)
+        size = file_data.tell()
+        file_data.seek(0)
+        
+        if size >= RESUMABLE_UPLOAD_THRESHOLD:
+            blob.chunk_size = UPLOAD_CHUNK_SIZE
+        blob.upload_from_file(file_data, size=size, content_type=content_type)
+        _remember_exists(gcp_path, True)
         
         # Make the blob publicly readable (optional, for POC)
         # In production, you might want to keep files private and use signed URLs
         # blob.make_public()
         
-        return f"gs://{bucket_name}/{gcp_path}"
+        return f"gs://{bucket.name}/{gcp_path}"
         
     except Exception as e:
-        print(f"Error uploading to GCS: {e}")
+        logger.exception("Error uploading to GCS")
         raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
 
 def download_from_gcp(gcp_path: str) -> bytes:
@@ -107,14 +341,7 @@ def download_from_gcp(gcp_path: str) -> bytes:
         The file content as bytes
     """
     try:
-        client = get_storage_client()
-        bucket_name = os.getenv('GCP_BUCKET_NAME')
-        
-        if not bucket_name:
-            raise HTTPException(status_code=500, detail="GCS bucket name not configured")
-        
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(gcp_path)
+        blob = _get_bucket().blob(gcp_path)
         
         # Download the file content
         file_content = blob.download_as_bytes()
@@ -122,9 +349,54 @@ def download_from_gcp(gcp_path: str) -> bytes:
         return file_content
         
     except Exception as e:
-        print(f"Error downloading from GCS: {e}")
+        logger.exception("Error downloading from GCS")
         raise HTTPException(status_code=500, detail=f"Failed to download file: {str(e)}")
 
+def download_to_file_from_gcp(gcp_path: str, dest: Optional[BinaryIO] = None) -> BinaryIO:
+    """
+    Stream a file from Google Cloud Storage into a file object
+    
+    Args:
+        gcp_path: The path in GCS bucket (user_id/doc_id/filename)
+        dest: File object to write into; defaults to a SpooledTemporaryFile
+              that moves to disk past SPOOL_MAX_SIZE
+    
+    Returns:
+        The file object holding the content, rewound to the start
+    """
+    if dest is None:
+        dest = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    
+    try:
+        blob = _get_bucket().blob(gcp_path)
+        blob.download_to_file(dest)
+        dest.seek(0)
+        return dest
+        
+    except Exception as e:
+        logger.exception("Error downloading from GCS")
+        raise HTTPException(status_code=500, detail=f"Failed to download file: {str(e)}")
+
+def signed_url_for_download(gcp_path: str, ttl: int = 300) -> str:
+    """
+    Create a V4 signed URL that lets a browser download a file directly from GCS
+    
+    Args:
+        gcp_path: The path in GCS bucket (user_id/doc_id/filename)
+        ttl: Seconds until the URL expires
+    
+    Returns:
+        The signed URL
+    """
+    try:
+        blob = _get_bucket().blob(gcp_path)
+        
+        return blob.generate_signed_url(version="v4", expiration=timedelta(seconds=ttl), method="GET")
+        
+    except Exception as e:
+        logger.exception("Error signing GCS download URL")
+        raise HTTPException(status_code=500, detail=f"Failed to create download link: {str(e)}")
+
 def delete_from_gcp(gcp_path: str) -> bool:
     """
     Delete file from Google Cloud Storage
@@ -136,47 +408,325 @@ def delete_from_gcp(gcp_path: str) -> bool:
         True if successful, False otherwise
     """
     try:
-        client = get_storage_client()
-        bucket_name = os.getenv('GCP_BUCKET_NAME')
-        
-        if not bucket_name:
-            print("GCS bucket name not configured")
-            return False
-        
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(gcp_path)
+        blob = _get_bucket().blob(gcp_path)
         
         # Delete the blob
         blob.delete()
+        _remember_exists(gcp_path, False)
         
         return True
         
     except Exception as e:
-        print(f"Error deleting from GCS: {e}")
+        logger.warning("Error deleting from GCS: %s", e)
         return False
 
 def file_exists_in_gcp(gcp_path: str) -> bool:
     """
     Check if file exists in Google Cloud Storage
     
+    Answers are cached for EXISTS_CACHE_TTL seconds; uploads and deletes
+    made through this module update the cache.
+    
     Args:
         gcp_path: The path in GCS bucket (user_id/doc_id/filename)
     
     Returns:
         True if file exists, False otherwise
     """
+    cached = _cached_exists(gcp_path)
+    if cached is not None:
+        return cached
+    
     try:
-        client = get_storage_client()
-        bucket_name = os.getenv('GCP_BUCKET_NAME')
+        blob = _get_bucket().blob(gcp_path)
         
-        if not bucket_name:
-            return False
+        exists = blob.exists()
+        _remember_exists(gcp_path, exists)
+        return exists
         
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(gcp_path)
+    except Exception as e:
+        logger.warning("Error checking file existence in GCS: %s", e)
+        return False
+
+def _batch_status_codes(gcp_paths: List[str], method: str, query_params: Optional[Dict[str, str]] = None) -> List[int]:
+    """
+    Send one JSON API request per path using GCS batch requests
+    
+    Requests are grouped GCS_BATCH_SIZE to a single HTTP request, and
+    failures are collected instead of raised.
+    
+    Args:
+        gcp_paths: Paths in GCS bucket (user_id/doc_id/filename)
+        method: HTTP method applied to each object
+        query_params: Query parameters for each request
+    
+    Returns:
+        The HTTP status code of each request, in input order
+    """
+    client = get_storage_client()
+    bucket = client.bucket(BUCKET_NAME)
+    status_codes = []
+    
+    for start in range(0, len(gcp_paths), GCS_BATCH_SIZE):
+        batch = client.batch(raise_exception=False)
+        for gcp_path in gcp_paths[start:start + GCS_BATCH_SIZE]:
+            batch.api_request(method=method, path=bucket.blob(gcp_path).path, query_params=query_params)
+        # Sub-responses come back in request order
+        status_codes.extend(response.status_code for response in batch.finish(raise_exception=False))
+    
+    return status_codes
+
+def delete_many(gcp_paths: List[str]) -> List[bool]:
+    """
+    Delete several files from Google Cloud Storage in batched requests
+    
+    Args:
+        gcp_paths: Paths in GCS bucket (user_id/doc_id/filename)
+    
+    Returns:
+        For each path, True if it was deleted, False otherwise
+    """
+    if not gcp_paths:
+        return []
+    
+    try:
+        deleted = [200 <= code < 300 for code in _batch_status_codes(gcp_paths, "DELETE")]
+        for gcp_path, was_deleted in zip(gcp_paths, deleted):
+            if was_deleted:
+                _remember_exists(gcp_path, False)
+        return deleted
+        
+    except Exception as e:
+        logger.warning("Error deleting from GCS: %s", e)
+        return [False] * len(gcp_paths)
+
+def files_exist_in_gcp(gcp_paths: List[str]) -> List[bool]:
+    """
+    Check whether several files exist in Google Cloud Storage in batched requests
+    
+    Paths in the existence cache are answered from it; only the rest are
+    sent to GCS, and their definite answers are cached.
+    
+    Args:
+        gcp_paths: Paths in GCS bucket (user_id/doc_id/filename)
+    
+    Returns:
+        For each path, True if the file exists, False otherwise
+    """
+    results = {gcp_path: _cached_exists(gcp_path) for gcp_path in gcp_paths}
+    unknown = [gcp_path for gcp_path, exists in results.items() if exists is None]
+    
+    if unknown:
+        try:
+            status_codes = _batch_status_codes(unknown, "GET", {"fields": "name"})
+            for gcp_path, code in zip(unknown, status_codes):
+                results[gcp_path] = 200 <= code < 300
+                if results[gcp_path] or code == 404:
+                    _remember_exists(gcp_path, results[gcp_path])
+                else:
+                    logger.warning("Error checking file existence in GCS: HTTP %s for %s", code, gcp_path)
+            
+        except Exception as e:
+            logger.warning("Error checking file existence in GCS: %s", e)
+            for gcp_path in unknown:
+                results[gcp_path] = False
+    
+    return [results[gcp_path] for gcp_path in gcp_paths]
+
+class _FileAdapter(io.RawIOBase):
+    """
+    Present any seekable binary file object as an io.IOBase
+    
+    gcloud-aio-storage only streams io.IOBase instances; SpooledTemporaryFile
+    (used by FastAPI's UploadFile) is not one before Python 3.11.
+    """
+    
+    def __init__(self, fileobj: BinaryIO):
+        self._fileobj = fileobj
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        data = self._fileobj.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._fileobj.seek(offset, whence)
+    
+    def tell(self) -> int:
+        return self._fileobj.tell()
+
+async def open_async_storage() -> None:
+    """Create the shared async GCS client; call once at app startup"""
+    global _ASYNC_STORAGE
+    credentials_dict = _service_account_info()
+    service_file = io.StringIO(json.dumps(credentials_dict)) if credentials_dict else None
+    session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=ASYNC_STORAGE_CONNECTION_LIMIT))
+    _ASYNC_STORAGE = AsyncStorage(service_file=service_file, session=session)
+
+async def close_async_storage() -> None:
+    """Close the shared async GCS client; call once at app shutdown"""
+    global _ASYNC_STORAGE
+    if _ASYNC_STORAGE is not None:
+        await _ASYNC_STORAGE.close()
+        _ASYNC_STORAGE = None
+
+def _get_async_storage() -> AsyncStorage:
+    """Get the shared async GCS client"""
+    if _ASYNC_STORAGE is None:
+        raise HTTPException(status_code=500, detail="Async cloud storage not initialized")
+    return _ASYNC_STORAGE
+
+async def upload_to_gcp_async(
+    file_data: Union[bytes, BinaryIO],
+    gcp_path: str,
+    content_type: Optional[str] = None
+) -> str:
+    """
+    Upload file to Google Cloud Storage without blocking the event loop
+    
+    Args:
+        file_data: File content as bytes or a seekable binary file object
+        gcp_path: The path in GCS bucket (user_id/doc_id/filename)
+        content_type: MIME type to store with the object
+    
+    Returns:
+        The GCS URL of the uploaded file
+    """
+    try:
+        file_data, content_type, content_encoding = _prepare_upload(file_data, gcp_path, content_type)
+        metadata = {'Content-Encoding': content_encoding} if content_encoding else None
+        if not isinstance(file_data, (bytes, io.IOBase)):
+            file_data = _FileAdapter(file_data)
+        
+        await _get_async_storage().upload(
+            BUCKET_NAME, gcp_path, file_data, content_type=content_type, metadata=metadata
+        )
+        _remember_exists(gcp_path, True)
+        
+        return f"gs://{BUCKET_NAME}/{gcp_path}"
+        
+    except Exception as e:
+        logger.exception("Error uploading to GCS")
+        raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
+
+async def download_from_gcp_async(gcp_path: str) -> bytes:
+    """
+    Download file from Google Cloud Storage without blocking the event loop
+    
+    Outside the API process (e.g. in the RQ worker, which has no app
+    lifespan) the async client is not open, so the sync client is used on a
+    worker thread instead.
+    
+    Args:
+        gcp_path: The path in GCS bucket (user_id/doc_id/filename)
+    
+    Returns:
+        The file content as bytes
+    """
+    if _ASYNC_STORAGE is None:
+        return await asyncio.to_thread(download_from_gcp, gcp_path)
+    
+    try:
+        return await _ASYNC_STORAGE.download(BUCKET_NAME, gcp_path)
         
-        return blob.exists()
+    except Exception as e:
+        logger.exception("Error downloading from GCS")
+        raise HTTPException(status_code=500, detail=f"Failed to download file: {str(e)}")
+
+async def delete_from_gcp_async(gcp_path: str) -> bool:
+    """
+    Delete file from Google Cloud Storage without blocking the event loop
+    
+    Args:
+        gcp_path: The path in GCS bucket (user_id/doc_id/filename)
+    
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        await _get_async_storage().delete(BUCKET_NAME, gcp_path)
+        _remember_exists(gcp_path, False)
+        return True
         
     except Exception as e:
-        print(f"Error checking file existence in GCS: {e}")
-        return False
\ No newline at end of file
+        logger.warning("Error deleting from GCS: %s", e)
+        return False
+
+async def file_exists_in_gcp_async(gcp_path: str) -> bool:
+    """
+    Check if file exists in Google Cloud Storage without blocking the event loop
+    
+    Args:
+        gcp_path: The path in GCS bucket (user_id/doc_id/filename)
+    
+    Returns:
+        True if file exists, False otherwise
+    """
+    cached = _cached_exists(gcp_path)
+    if cached is not None:
+        return cached
+    
+    try:
+        await _get_async_storage().download_metadata(BUCKET_NAME, gcp_path)
+        _remember_exists(gcp_path, True)
+        return True
+        
+    except aiohttp.ClientResponseError as e:
+        if e.status == 404:
+            _remember_exists(gcp_path, False)
+        else:
+            logger.warning("Error checking file existence in GCS: %s", e)
+        return False
+    except Exception as e:
+        logger.warning("Error checking file existence in GCS: %s", e)
+        return False
+
+async def upload_many(
+    items: List[Tuple[Union[bytes, BinaryIO], str]],
+    concurrency: int = GCS_TRANSFER_CONCURRENCY
+) -> List[str]:
+    """
+    Upload several files to Google Cloud Storage concurrently
+    
+    Args:
+        items: (file content, gcp_path) pairs
+        concurrency: Maximum uploads in flight at once
+    
+    Returns:
+        The GCS URLs of the uploaded files, in input order
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def upload_one(file_data: Union[bytes, BinaryIO], gcp_path: str) -> str:
+        async with semaphore:
+            return await upload_to_gcp_async(file_data, gcp_path)
+    
+    return await asyncio.gather(*[upload_one(file_data, gcp_path) for file_data, gcp_path in items])
+
+async def download_many(
+    gcp_paths: List[str],
+    concurrency: int = GCS_TRANSFER_CONCURRENCY
+) -> List[bytes]:
+    """
+    Download several files from Google Cloud Storage concurrently
+    
+    Args:
+        gcp_paths: Paths in GCS bucket (user_id/doc_id/filename)
+        concurrency: Maximum downloads in flight at once
+    
+    Returns:
+        The file contents as bytes, in input order
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def download_one(gcp_path: str) -> bytes:
+        async with semaphore:
+            return await download_from_gcp_async(gcp_path)
+    
+    return await asyncio.gather(*[download_one(gcp_path) for gcp_path in gcp_paths])
@@ -0,0 +1,42 @@
+-- Add single round-trip document functions to an existing database
+-- Execute this in your Supabase SQL Editor
+
+-- Insert a document with the user context set in the same transaction (one round-trip)
+CREATE OR REPLACE FUNCTION insert_document_with_context(
+    p_user_id TEXT,
+    p_doc_id TEXT,
+    p_filename TEXT,
+    p_file_type TEXT,
+    p_file_size INTEGER,
+    p_gcp_path TEXT,
+    p_uploaded_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+)
+RETURNS SETOF documents AS $$
+BEGIN
+    PERFORM set_user_context(p_user_id);
+    RETURN QUERY
+    WITH inserted AS (
+        INSERT INTO documents (doc_id, user_id, filename, file_type, file_size, gcp_path, embedding_status, uploaded_at)
+        VALUES (p_doc_id, p_user_id, p_filename, p_file_type, p_file_size, p_gcp_path, 'pending', p_uploaded_at)
+        RETURNING *
+    )
+    SELECT * FROM inserted;
+END;
+$$ LANGUAGE plpgsql;
+
+-- List a user's documents with the user context set in the same transaction (one round-trip)
+CREATE OR REPLACE FUNCTION get_user_documents_with_context(p_user_id TEXT)
+RETURNS SETOF documents AS $$
+BEGIN
+    PERFORM set_user_context(p_user_id);
+    RETURN QUERY
+    SELECT * FROM documents
+    WHERE user_id = p_user_id
+    ORDER BY uploaded_at DESC;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Verify the functions
+SELECT routine_name
+FROM information_schema.routines
+WHERE routine_name IN ('insert_document_with_context', 'get_user_documents_with_context');